@@ -10,6 +10,11 @@ from typing import Any
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # pragma: no cover - PyYAML built without LibYAML
+    from yaml import SafeLoader as _YamlLoader
+
 _ENV_VAR_RE = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)\}")
 
 
@@ -56,13 +61,15 @@ class ConfigLoadResult:
     config: Config
 
 
-def _resolve_env_vars(value: Any) -> Any:
-    if isinstance(value, str):
+def _env_repl(match: re.Match[str]) -> str:
+    return os.environ.get(match.group(1), match.group(0))
 
-        def repl(match: re.Match[str]) -> str:
-            return os.environ.get(match.group(1), match.group(0))
 
-        return _ENV_VAR_RE.sub(repl, value)
+def _resolve_env_vars(value: Any) -> Any:
+    if isinstance(value, str):
+        if "${" not in value:
+            return value
+        return _ENV_VAR_RE.sub(_env_repl, value)
     if isinstance(value, list):
         return [_resolve_env_vars(item) for item in value]
     if isinstance(value, dict):
@@ -70,20 +77,35 @@ def _resolve_env_vars(value: Any) -> Any:
     return value
 
 
+def _split_env_line(line: str) -> tuple[str, str] | None:
+    """Split a .env line into (key, raw value).
+
+    Returns None for blank, comment and non-assignment lines. A leading
+    ``export`` is dropped so shell-style files load under the bare key.
+    """
+    line = line.strip()
+    if not line or line.startswith("#") or "=" not in line:
+        return None
+    key, value = line.split("=", 1)
+    key = key.strip()
+    if key.startswith("export "):
+        key = key[len("export ") :].strip()
+    if not key:
+        return None
+    return key, value
+
+
 def _load_workspace_env(env_path: Path) -> None:
     if not env_path.exists():
         return
 
-    for line in env_path.read_text().splitlines():
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        if "=" not in line:
+    for line in env_path.read_bytes().decode("utf-8").splitlines():
+        parsed = _split_env_line(line)
+        if parsed is None:
             continue
-        key, value = line.split("=", 1)
-        key = key.strip()
+        key, value = parsed
         value = value.strip().strip('"').strip("'")
-        if key and key not in os.environ:
+        if key not in os.environ:
             os.environ[key] = value
 
 
@@ -91,7 +113,7 @@ def _load_yaml(config_path: Path) -> dict[str, Any]:
     if not config_path.exists():
         raise FileNotFoundError(f"config.yaml not found at {config_path}")
     with config_path.open("r", encoding="utf-8") as fp:
-        raw = yaml.safe_load(fp) or {}
+        raw = yaml.load(fp, Loader=_YamlLoader) or {}
 
     return _resolve_env_vars(raw)
 
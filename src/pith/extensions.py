@@ -45,10 +45,15 @@ class ExtensionRegistry:
         self.tools: dict[str, ExtensionTool] = {}
         self.channels: dict[str, ExtensionChannel] = {}
         self.mcp = MCPRegistry()
+        # path -> ((mtime_ns, size), module); unchanged files are not re-imported.
+        self._module_cache: dict[Path, tuple[tuple[int, int], ModuleType]] = {}
 
     async def refresh(self) -> tuple[dict[str, ExtensionTool], dict[str, ExtensionChannel]]:
         self.tools = await self._load_tools()
         self.channels = await self._load_channels()
+        live = {t.module_path for t in self.tools.values()}
+        live.update(c.module_path for c in self.channels.values())
+        self._module_cache = {p: v for p, v in self._module_cache.items() if p in live}
         await self.mcp.refresh(self.mcp_dir)
         return self.tools, self.channels
 
@@ -97,6 +102,12 @@ class ExtensionRegistry:
         return out
 
     async def _load_module(self, path: Path) -> ModuleType:
+        st = path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._module_cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
         module_name = f"pith_extensions_{path.parent.name}_{path.stem}"
         if module_name in sys.modules:
             del sys.modules[module_name]
@@ -108,6 +119,7 @@ class ExtensionRegistry:
         module = importlib.util.module_from_spec(spec)
         sys.modules[module_name] = module
         await asyncio.to_thread(spec.loader.exec_module, module)
+        self._module_cache[path] = (stamp, module)
         return module
 
     async def call_tool(self, name: str, args: dict[str, Any] | None = None) -> str:
@@ -6,6 +6,7 @@ workspace/mcp/<name>.yaml files. HTTP (streamable) transport only.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -14,7 +15,7 @@ from typing import Any
 import httpx
 import yaml
 
-from .config import _resolve_env_vars
+from .config import _resolve_env_vars, _YamlLoader
 
 logger = logging.getLogger(__name__)
 
@@ -54,20 +55,30 @@ class MCPRegistry:
                 continue
             name = path.stem
             try:
-                server = _parse_server_config(name, path)
-                self.servers[name] = server
-                tools = await _discover_tools(server)
-                for tool in tools:
-                    full_name = f"mcp_{name}_{tool.name}"
-                    self.tools[full_name] = MCPTool(
-                        server=name,
-                        name=tool.name,
-                        description=tool.description,
-                        input_schema=tool.input_schema,
-                    )
+                self.servers[name] = _parse_server_config(name, path)
             except Exception as exc:
                 logger.warning("mcp server '%s' skipped: %s", name, exc)
 
+        # Discovery is network-bound; query every server concurrently.
+        servers = list(self.servers.values())
+        results = await asyncio.gather(
+            *(_discover_tools(server) for server in servers), return_exceptions=True
+        )
+        for server, result in zip(servers, results, strict=True):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logger.warning("mcp server '%s' skipped: %s", server.name, result)
+                continue
+            prefix = f"mcp_{server.name}_"
+            for tool in result:
+                self.tools[prefix + tool.name] = MCPTool(
+                    server=server.name,
+                    name=tool.name,
+                    description=tool.description,
+                    input_schema=tool.input_schema,
+                )
+
     async def call(self, full_name: str, args: dict[str, Any] | None = None) -> str:
         """Route mcp_<server>_<tool> to the right server's tools/call."""
         tool = self.tools.get(full_name)
@@ -95,7 +106,7 @@ class MCPRegistry:
 
 def _parse_server_config(name: str, path: Path) -> MCPServer:
     with path.open("r", encoding="utf-8") as fp:
-        raw = yaml.safe_load(fp) or {}
+        raw = yaml.load(fp, Loader=_YamlLoader) or {}
 
     raw = _resolve_env_vars(raw)
 
@@ -7,8 +7,10 @@ import fnmatch
 import json
 import os
 import re
+import secrets
+import shutil
+import tempfile
 import textwrap
-import uuid
 from collections.abc import Awaitable, Callable
 from pathlib import Path
 from typing import Any
@@ -27,7 +29,7 @@ from pydantic_ai.messages import (
     TextPartDelta,
 )
 
-from .config import Config
+from .config import Config, _split_env_line
 from .constants import (
     DEFAULT_MAX_TOOL_OUTPUT_CHARS,
     DEFAULT_MEMORY_TOP_N,
@@ -39,6 +41,48 @@ from .storage import Storage
 SECRET_TIMEOUT = 60
 
 
+def _upsert_env_var(env_path: Path, name: str, value: str) -> None:
+    """Set name=value in a .env file, replacing any existing entry for name.
+
+    Streams the old file into a sibling temp file and swaps it in atomically. A
+    symlinked .env is updated at its target, and the file keeps its mode and owner.
+    """
+    target = env_path.resolve()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    entry = f"{name}={value}\n"
+    replaced = False
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=target.parent, prefix=".env.", delete=False
+    ) as tmp:
+        try:
+            try:
+                with target.open(encoding="utf-8") as src:
+                    for line in src:
+                        parsed = _split_env_line(line)
+                        if parsed is not None and parsed[0] == name:
+                            tmp.write(entry)
+                            replaced = True
+                            continue
+                        tmp.write(line if line.endswith("\n") else line + "\n")
+                # The swap creates a new inode; keep the original's mode and owner
+                # (e.g. a root container rewriting a host user's bind-mounted .env).
+                shutil.copymode(target, tmp.name)
+                st = target.stat()
+                try:
+                    os.chown(tmp.name, st.st_uid, st.st_gid)
+                except PermissionError:
+                    pass
+            except FileNotFoundError:
+                pass
+            if not replaced:
+                tmp.write(entry)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    os.replace(tmp.name, target)
+
+
 class Runtime:
     def __init__(
         self,
@@ -50,36 +94,49 @@ class Runtime:
         self.storage = storage
         self.extensions = extensions
         self.workspace = Path(cfg.runtime.workspace_path)
+        self._workspace_root = self.workspace.resolve()
+        self.env_path = self.workspace.parent / ".env"
         self.log_dir = Path(cfg.runtime.log_dir)
         self.log_path = self.log_dir / "events.jsonl"
         self.storage.log_path = self.log_path
         self.agent: Agent[None, str] | None = None
-        self._pending_secrets: dict[str, asyncio.Event] = {}
-        self._secret_values: dict[str, str] = {}
+        self._pending_secrets: dict[str, asyncio.Future[str]] = {}
         self._on_secret_request: Callable[[str, str], Awaitable[None]] | None = None
-
-    @property
-    def env_path(self) -> Path:
-        return Path(self.cfg.runtime.workspace_path).parent / ".env"
+        # ((mtime_ns, size) of .env, key names) — reparsed only when the file changes.
+        self._env_cache: tuple[tuple[int, int], list[str]] | None = None
 
     def provide_secret(self, request_id: str, value: str) -> None:
         """Deliver a secret value from the client and unblock the waiting tool."""
-        self._secret_values[request_id] = value
-        event = self._pending_secrets.get(request_id)
-        if event:
-            event.set()
+        pending = self._pending_secrets.pop(request_id, None)
+        if pending is not None and not pending.done():
+            pending.set_result(value)
 
     async def initialize(self) -> None:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        # Extension/MCP discovery does not touch the database; overlap the two.
+        tasks = [
+            asyncio.ensure_future(self.extensions.refresh()),
+            asyncio.ensure_future(self._initialize_storage()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Don't leave the other half running against storage the caller is closing.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _initialize_storage(self) -> None:
         await self.storage.ensure_schema()
-        await self.extensions.refresh()
         await self._ensure_bootstrap_state()
-        self.log_dir.mkdir(parents=True, exist_ok=True)
 
     async def _ensure_bootstrap_state(self) -> None:
         complete = await self.storage.get_bootstrap_state()
-        await self.storage.set_bootstrap_complete(complete)
-        if not complete:
-            await self.storage.set_app_state("bootstrap_note", "identity not fully configured")
+        async with self.storage.transaction():
+            await self.storage.set_bootstrap_complete(complete)
+            if not complete:
+                await self.storage.set_app_state("bootstrap_note", "identity not fully configured")
 
     # -- Agent construction --
 
@@ -310,16 +367,16 @@ class Runtime:
             target = runtime._resolve_workspace_path(path)
             if not target.is_dir():
                 return f"not a directory: {path}"
-            ws_root = runtime.workspace.resolve()
+            ws_root = runtime._workspace_root
             if recursive:
                 entries = sorted(target.rglob("*"))
             else:
                 entries = sorted(target.iterdir())
             lines: list[str] = []
             for entry in entries:
-                rel = str(entry.relative_to(ws_root))
                 if glob and not fnmatch.fnmatch(entry.name, glob):
                     continue
+                rel = str(entry.relative_to(ws_root))
                 suffix = "/" if entry.is_dir() else ""
                 lines.append(f"{rel}{suffix}")
             output = "\n".join(lines)
@@ -342,7 +399,7 @@ class Runtime:
             max_results: int = 50,
         ) -> str:
             """Grep-like search across workspace files."""
-            ws_root = runtime.workspace.resolve()
+            ws_root = runtime._workspace_root
             if literal:
                 regex = re.compile(re.escape(pattern))
             else:
@@ -350,6 +407,8 @@ class Runtime:
                     regex = re.compile(pattern)
                 except re.error as exc:
                     return f"invalid regex: {exc}"
+            # Literal needles are checked on raw bytes so non-matching files skip decoding.
+            needle = pattern.encode("utf-8") if literal else None
             matches: list[str] = []
             if recursive:
                 files = sorted(ws_root.rglob(glob))
@@ -358,10 +417,16 @@ class Runtime:
             for filepath in files:
                 if not filepath.is_file():
                     continue
+                try:
+                    data = filepath.read_bytes()
+                except PermissionError:
+                    continue
+                if needle is not None and needle not in data:
+                    continue
                 # Skip binary / non-text files
                 try:
-                    text = filepath.read_text(encoding="utf-8")
-                except (UnicodeDecodeError, PermissionError):
+                    text = data.decode("utf-8")
+                except UnicodeDecodeError:
                     continue
                 rel = str(filepath.relative_to(ws_root))
                 for lineno, line in enumerate(text.splitlines(), 1):
@@ -511,18 +576,7 @@ class Runtime:
         )
         async def list_secrets() -> str:
             """Return the names of secrets stored in .env."""
-            env_path = runtime.env_path
-            if not env_path.exists():
-                return "[]"
-            names: list[str] = []
-            for line in env_path.read_text(encoding="utf-8").splitlines():
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                key = line.split("=", 1)[0].strip()
-                if key:
-                    names.append(key)
-            return json.dumps(names)
+            return json.dumps(runtime._env_keys())
 
         @agent.tool_plain(
             description=(
@@ -537,46 +591,28 @@ class Runtime:
                     "error: non-interactive session — ask the user to set this secret via the CLI"
                 )
 
-            request_id = uuid.uuid4().hex[:12]
-            event = asyncio.Event()
-            runtime._pending_secrets[request_id] = event
+            request_id = secrets.token_hex(6)
+            pending: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+            runtime._pending_secrets[request_id] = pending
 
             try:
                 await runtime._on_secret_request(request_id, name)
                 try:
-                    await asyncio.wait_for(event.wait(), timeout=SECRET_TIMEOUT)
+                    value = await asyncio.wait_for(pending, timeout=SECRET_TIMEOUT)
                 except TimeoutError:
                     return "error: timed out waiting for secret input"
 
-                value = runtime._secret_values.pop(request_id, "")
                 if not value:
                     return "error: no value provided"
 
-                # Write to .env
-                env_path = runtime.env_path
-                env_path.parent.mkdir(parents=True, exist_ok=True)
-                lines: list[str] = []
-                replaced = False
-                if env_path.exists():
-                    for line in env_path.read_text(encoding="utf-8").splitlines():
-                        stripped = line.strip()
-                        if stripped and not stripped.startswith("#") and "=" in stripped:
-                            key = stripped.split("=", 1)[0].strip()
-                            if key == name:
-                                lines.append(f"{name}={value}")
-                                replaced = True
-                                continue
-                        lines.append(line)
-                if not replaced:
-                    lines.append(f"{name}={value}")
-                env_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+                _upsert_env_var(runtime.env_path, name, value)
+                runtime._env_cache = None
 
                 # Set in current process
                 os.environ[name] = value
                 return f"stored secret '{name}'"
             finally:
                 runtime._pending_secrets.pop(request_id, None)
-                runtime._secret_values.pop(request_id, None)
 
     # -- Chat --
 
@@ -651,11 +687,12 @@ class Runtime:
 
         # Persist all new messages from this run
         new_messages: list[ModelMessage] = run.result.new_messages()
-        await self.storage.append_messages(session_id, new_messages)
+        async with self.storage.transaction():
+            await self.storage.append_messages(session_id, new_messages)
 
-        # Check bootstrap completion
-        if bootstrap:
-            await self.storage.set_bootstrap_complete(await self.storage.get_bootstrap_state())
+            # Check bootstrap completion
+            if bootstrap:
+                await self.storage.set_bootstrap_complete(await self.storage.get_bootstrap_state())
 
         return "".join(full_text)
 
@@ -694,11 +731,28 @@ class Runtime:
     # -- Helpers --
 
     def _resolve_workspace_path(self, path: str) -> Path:
-        resolved = (self.workspace / path).resolve()
-        if not resolved.is_relative_to(self.workspace.resolve()):
+        # The candidate is still fully resolved so symlinks cannot escape the sandbox.
+        resolved = (self._workspace_root / path).resolve()
+        if not resolved.is_relative_to(self._workspace_root):
             raise ValueError(f"path escapes workspace: {path}")
         return resolved
 
+    def _env_keys(self) -> list[str]:
+        """Return the key names defined in .env, in file order."""
+        try:
+            st = self.env_path.stat()
+        except FileNotFoundError:
+            return []
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._env_cache is not None and self._env_cache[0] == stamp:
+            return self._env_cache[1]
+
+        data = self.env_path.read_bytes()
+        parsed = (_split_env_line(line) for line in data.decode("utf-8").splitlines())
+        names = [kv[0] for kv in parsed if kv is not None]
+        self._env_cache = (stamp, names)
+        return names
+
     def _read_soul(self) -> str:
         soul = self.workspace / SOUL_FILE
         if not soul.exists():
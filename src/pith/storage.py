@@ -2,9 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import os
 import sqlite3
-from collections.abc import Iterable
+import time
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from pathlib import Path
@@ -19,8 +23,18 @@ from pydantic_ai.messages import (
     UserPromptPart,
 )
 
+# Hot-path inserts are kept as fixed literals so sqlite3's statement cache always hits.
+_SQL_INSERT_MESSAGE = "INSERT INTO messages(session_id, message_json) VALUES(?,?)"
+_SQL_INSERT_MEMORY = "INSERT INTO memory_entries(content, kind, tags, source) VALUES(?,?,?,?)"
 
-@dataclass
+
+def _new_session_id() -> str:
+    # Both components come from a single clock read so they always agree.
+    now_s = time.time_ns() // 1_000_000_000
+    return datetime.fromtimestamp(now_s, UTC).strftime("%Y%m%dT%H%M%S") + "." + str(now_s)
+
+
+@dataclass(slots=True)
 class MemoryEntry:
     id: int
     content: str
@@ -34,8 +48,13 @@ class MemoryEntry:
 class Storage:
     def __init__(self, db_path: str | Path, log_path: Path | None = None):
         self.db_path = Path(db_path)
+        self._in_memory = str(db_path) == ":memory:"
         self.log_path = log_path
         self._conn: aiosqlite.Connection | None = None
+        self._write_lock = asyncio.Lock()
+        self._tx_owner: asyncio.Task[Any] | None = None
+        # Event log stays open for appends; (path, fd) so a reassigned log_path reopens.
+        self._log_file: tuple[Path, int] | None = None
 
     async def __aenter__(self) -> Storage:
         await self.connect()
@@ -43,16 +62,19 @@ class Storage:
         return self
 
     async def __aexit__(self, *exc_info: object) -> None:
-        if self._conn is not None:
-            await self._conn.close()
-            self._conn = None
+        await self.close()
 
     async def connect(self) -> aiosqlite.Connection:
         if self._conn is None:
-            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            if not self._in_memory:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.log_path is not None:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
             self._conn = await aiosqlite.connect(self.db_path)
             self._conn.row_factory = aiosqlite.Row
             await self._conn.execute("PRAGMA journal_mode=WAL;")
+            # Under WAL, NORMAL only fsyncs at checkpoints and cannot corrupt the database.
+            await self._conn.execute("PRAGMA synchronous=NORMAL;")
             await self._conn.execute("PRAGMA foreign_keys=ON;")
         return self._conn
 
@@ -121,22 +143,34 @@ class Storage:
             INSERT INTO memory_fts(rowid, content) VALUES (new.id, new.content);
         END;
         """)
+        # memory_fts is external-content: it stores only the index, never a copy of
+        # the text. Removals must use the 'delete' command with the old content, and
+        # only content edits touch the index (flag flips like deleted=1 do not).
+        await conn.execute("DROP TRIGGER IF EXISTS memory_ad")
+        await conn.execute("DROP TRIGGER IF EXISTS memory_au")
         await conn.execute("""
-        CREATE TRIGGER IF NOT EXISTS memory_ad AFTER DELETE ON memory_entries
+        CREATE TRIGGER memory_ad AFTER DELETE ON memory_entries
         BEGIN
-            DELETE FROM memory_fts WHERE rowid = old.id;
+            INSERT INTO memory_fts(memory_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
         END;
         """)
         await conn.execute("""
-        CREATE TRIGGER IF NOT EXISTS memory_au AFTER UPDATE ON memory_entries
+        CREATE TRIGGER memory_au AFTER UPDATE OF content ON memory_entries
         BEGIN
-            UPDATE memory_fts SET content = new.content WHERE rowid = new.id;
+            INSERT INTO memory_fts(memory_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO memory_fts(rowid, content) VALUES (new.id, new.content);
         END;
         """)
         await conn.execute("""
         CREATE INDEX IF NOT EXISTS idx_messages_session_created
         ON messages(session_id, created_at)
         """)
+        await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_memory_live_created
+        ON memory_entries(created_at DESC) WHERE deleted = 0
+        """)
 
         # Schema migration: drop tables with stale schemas (early-stage, no data to preserve)
         for table, required_col in [("messages", "message_json")]:
@@ -173,10 +207,55 @@ class Storage:
         finally:
             await cursor.close()
 
+    @asynccontextmanager
+    async def _write(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Run one write method's statements and commit them.
+
+        Writes from different tasks share one connection, so they are serialized on
+        a lock. Inside the current task's transaction() the block owns the commit.
+        """
+        conn = await self.connect()
+        if self._tx_owner is not None and self._tx_owner is asyncio.current_task():
+            yield conn
+            return
+        async with self._write_lock:
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Group several writes into one commit; roll all of them back on error.
+
+        The block holds the write lock, so other tasks' writes wait for it rather than
+        joining it. A nested block in the same task joins the outer one.
+        """
+        conn = await self.connect()
+        if self._tx_owner is not None and self._tx_owner is asyncio.current_task():
+            yield
+            return
+        async with self._write_lock:
+            self._tx_owner = asyncio.current_task()
+            try:
+                yield
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+            finally:
+                self._tx_owner = None
+
     async def close(self) -> None:
         if self._conn is not None:
             await self._conn.close()
             self._conn = None
+        if self._log_file is not None:
+            os.close(self._log_file[1])
+            self._log_file = None
 
     # -- Logging (JSONL only) --
 
@@ -185,26 +264,29 @@ class Storage:
     ) -> None:
         if self.log_path is None:
             return
-        self.log_path.parent.mkdir(parents=True, exist_ok=True)
         entry = {
             "event": event,
             "level": level,
             "payload": payload or {},
             "ts": datetime.now(UTC).isoformat(),
         }
-        with self.log_path.open("a", encoding="utf-8") as fp:
-            fp.write(json.dumps(entry) + "\n")
+        if self._log_file is None or self._log_file[0] != self.log_path:
+            if self._log_file is not None:
+                os.close(self._log_file[1])
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+            self._log_file = (self.log_path, os.open(self.log_path, flags, 0o644))
+        # Written immediately (not buffered) so `pith logs tail` sees events live.
+        os.write(self._log_file[1], json.dumps(entry).encode() + b"\n")
 
     # -- App state --
 
     async def set_app_state(self, key: str, value: str) -> None:
-        conn = await self.connect()
-        await conn.execute(
-            "INSERT INTO app_state(key,value) VALUES(?,?) "
-            "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-            (key, value),
-        )
-        await conn.commit()
+        async with self._write() as conn:
+            await conn.execute(
+                "INSERT INTO app_state(key,value) VALUES(?,?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (key, value),
+            )
 
     async def get_app_state(self, key: str, default: str | None = None) -> str | None:
         row = await self._fetchone("SELECT value FROM app_state WHERE key=?", (key,))
@@ -213,15 +295,14 @@ class Storage:
     # -- Profiles --
 
     async def set_profile(self, profile_type: str, key: str, value: str) -> None:
-        conn = await self.connect()
         updated = datetime.now(UTC).isoformat()
-        await conn.execute(
-            "INSERT INTO profiles(profile_type,key,value,updated_at) VALUES(?,?,?,?) "
-            "ON CONFLICT(profile_type,key) DO UPDATE SET "
-            "value=excluded.value, updated_at=excluded.updated_at",
-            (profile_type, key, value, updated),
-        )
-        await conn.commit()
+        async with self._write() as conn:
+            await conn.execute(
+                "INSERT INTO profiles(profile_type,key,value,updated_at) VALUES(?,?,?,?) "
+                "ON CONFLICT(profile_type,key) DO UPDATE SET "
+                "value=excluded.value, updated_at=excluded.updated_at",
+                (profile_type, key, value, updated),
+            )
 
     async def get_profile(self, profile_type: str) -> dict[str, str]:
         rows = await self._fetchall(
@@ -231,12 +312,22 @@ class Storage:
         return {row[0]: row[1] for row in rows}
 
     async def get_bootstrap_state(self) -> bool:
-        complete_raw = await self.get_app_state("bootstrap_complete", "0")
-        if complete_raw == "1":
+        # One round-trip for the completion flag and both profiles.
+        rows = await self._fetchall(
+            """
+            SELECT 'app', key, value FROM app_state WHERE key = 'bootstrap_complete'
+            UNION ALL
+            SELECT profile_type, key, value FROM profiles WHERE profile_type IN ('agent', 'user')
+            """
+        )
+        state: dict[str, dict[str, str]] = {"app": {}, "agent": {}, "user": {}}
+        for row in rows:
+            state[row[0]][row[1]] = row[2]
+        if state["app"].get("bootstrap_complete") == "1":
             return True
 
-        agent = await self.get_profile("agent")
-        user = await self.get_profile("user")
+        agent = state["agent"]
+        user = state["user"]
         required_agent = ("name", "nature")
         required_user = ("name",)
 
@@ -254,53 +345,45 @@ class Storage:
     # -- Sessions --
 
     async def ensure_active_session(self) -> str:
-        conn = await self.connect()
-        row = await self._fetchone("SELECT value FROM app_state WHERE key='active_session_id'")
-        if row:
-            return str(row[0])
-
-        now = datetime.now(UTC)
-        session_id = now.strftime("%Y%m%dT%H%M%S") + "." + str(int(now.timestamp()))
-        await conn.execute("INSERT INTO sessions(id) VALUES(?)", (session_id,))
-        await conn.execute(
-            "INSERT INTO app_state(key,value) VALUES('active_session_id',?)",
-            (session_id,),
-        )
-        await conn.commit()
+        async with self._write() as conn:
+            row = await self._fetchone("SELECT value FROM app_state WHERE key='active_session_id'")
+            if row:
+                return str(row[0])
+
+            session_id = _new_session_id()
+            await conn.execute("INSERT INTO sessions(id) VALUES(?)", (session_id,))
+            await conn.execute(
+                "INSERT INTO app_state(key,value) VALUES('active_session_id',?)",
+                (session_id,),
+            )
         return session_id
 
     async def set_active_session(self, session_id: str) -> None:
         await self.set_app_state("active_session_id", session_id)
 
     async def new_session(self) -> str:
-        now = datetime.now(UTC)
-        session_id = now.strftime("%Y%m%dT%H%M%S") + "." + str(int(now.timestamp()))
-        conn = await self.connect()
-        await conn.execute("INSERT INTO sessions(id) VALUES(?)", (session_id,))
-        await conn.execute(
-            "INSERT INTO app_state(key,value) VALUES('active_session_id',?) "
-            "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-            (session_id,),
-        )
-        await conn.commit()
+        session_id = _new_session_id()
+        async with self._write() as conn:
+            await conn.execute("INSERT INTO sessions(id) VALUES(?)", (session_id,))
+            await conn.execute(
+                "INSERT INTO app_state(key,value) VALUES('active_session_id',?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (session_id,),
+            )
         return session_id
 
     # -- Messages (ModelMessage serialization) --
 
     async def append_messages(self, session_id: str, messages: list[ModelMessage]) -> None:
-        conn = await self.connect()
         adapter = ModelMessagesTypeAdapter
-        for msg in messages:
-            serialized = json.dumps(adapter.dump_python([msg], mode="json")[0])
+        # dump_json serializes in one pass; strip the brackets of the 1-element array.
+        rows = [(session_id, adapter.dump_json([msg])[1:-1].decode()) for msg in messages]
+        async with self._write() as conn:
+            await conn.executemany(_SQL_INSERT_MESSAGE, rows)
             await conn.execute(
-                "INSERT INTO messages(session_id, message_json) VALUES(?,?)",
-                (session_id, serialized),
+                "UPDATE sessions SET updated_at=strftime('%Y-%m-%dT%H:%M:%fZ','now') WHERE id=?",
+                (session_id,),
             )
-        await conn.execute(
-            "UPDATE sessions SET updated_at=strftime('%Y-%m-%dT%H:%M:%fZ','now') WHERE id=?",
-            (session_id,),
-        )
-        await conn.commit()
 
     async def get_message_history(self, session_id: str, limit: int = 20) -> list[ModelMessage]:
         rows = await self._fetchall(
@@ -313,8 +396,8 @@ class Storage:
             """,
             (session_id, limit),
         )
-        rows = rows[::-1]  # chronological order
-        raw_list = [json.loads(row[0]) for row in rows]
+        # Rows come newest-first; reverse lazily into chronological order.
+        raw_list = [json.loads(row[0]) for row in reversed(rows)]
         messages = ModelMessagesTypeAdapter.validate_python(raw_list)
 
         # Trim orphaned messages from the front. The LIMIT can cut in the
@@ -334,42 +417,41 @@ class Storage:
     # -- Compaction --
 
     async def compact_session(self, session_id: str, keep_recent: int = 50) -> None:
-        conn = await self.connect()
-        count_row = await self._fetchone(
-            "SELECT COUNT(*) FROM messages WHERE session_id=?",
-            (session_id,),
-        )
-        total = int(count_row[0] if count_row else 0)
-        if total <= keep_recent:
-            return
+        async with self._write() as conn:
+            count_row = await self._fetchone(
+                "SELECT COUNT(*) FROM messages WHERE session_id=?",
+                (session_id,),
+            )
+            total = int(count_row[0] if count_row else 0)
+            if total <= keep_recent:
+                return
 
-        surplus = total - keep_recent
-        if surplus <= 0:
-            return
+            surplus = total - keep_recent
+            if surplus <= 0:
+                return
 
-        rows = await self._fetchall(
-            """
-            SELECT id, message_json
-            FROM messages
-            WHERE session_id=?
-            ORDER BY id ASC
-            LIMIT ?
-            """,
-            (session_id, surplus),
-        )
+            rows = await self._fetchall(
+                """
+                SELECT id, message_json
+                FROM messages
+                WHERE session_id=?
+                ORDER BY id ASC
+                LIMIT ?
+                """,
+                (session_id, surplus),
+            )
 
-        summary_parts: list[str] = [str(r[1])[:200] for r in rows]
-        summary = "\n".join(summary_parts)
-        await conn.execute(
-            "INSERT INTO session_summaries(session_id, summary) VALUES(?, ?)",
-            (session_id, summary),
-        )
+            summary_parts: list[str] = [str(r[1])[:200] for r in rows]
+            summary = "\n".join(summary_parts)
+            await conn.execute(
+                "INSERT INTO session_summaries(session_id, summary) VALUES(?, ?)",
+                (session_id, summary),
+            )
 
-        oldest = rows[-1][0]
-        await conn.execute(
-            "DELETE FROM messages WHERE session_id=? AND id<=?", (session_id, oldest)
-        )
-        await conn.commit()
+            oldest = rows[-1][0]
+            await conn.execute(
+                "DELETE FROM messages WHERE session_id=? AND id<=?", (session_id, oldest)
+            )
 
     async def list_session_summaries(self, session_id: str) -> list[str]:
         rows = await self._fetchall(
@@ -387,13 +469,11 @@ class Storage:
         tags: Iterable[str] | None = None,
         source: str = "runtime",
     ) -> int:
-        conn = await self.connect()
         normalized_tags = ",".join(tags or ())
-        cur = await conn.execute(
-            "INSERT INTO memory_entries(content, kind, tags, source) VALUES(?,?,?,?)",
-            (content, kind, normalized_tags or None, source),
-        )
-        await conn.commit()
+        async with self._write() as conn:
+            cur = await conn.execute(
+                _SQL_INSERT_MEMORY, (content, kind, normalized_tags or None, source)
+            )
         return int(cur.lastrowid)
 
     async def memory_search(self, query: str, limit: int = 8) -> list[MemoryEntry]:
@@ -0,0 +1,42 @@
+"""Shared test fixtures."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from pith.config import Config, ModelConfig, RuntimeConfig, ServerConfig
+from pith.extensions import ExtensionRegistry
+from pith.runtime import Runtime
+from pith.storage import Storage
+
+# Runtime never mutates these, so every test runtime can share them.
+_MODEL_CONFIG = ModelConfig(provider="test", model="test-model", api_key_env="TEST_KEY")
+_SERVER_CONFIG = ServerConfig()
+
+
+def _make_runtime(workspace: Path) -> tuple[Runtime, Storage]:
+    workspace.mkdir(parents=True, exist_ok=True)
+    cfg = Config(
+        version=1,
+        runtime=RuntimeConfig(
+            workspace_path=str(workspace),
+            memory_db_path=str(workspace / "memory.db"),
+            log_dir=str(workspace / "logs"),
+        ),
+        model=_MODEL_CONFIG,
+        server=_SERVER_CONFIG,
+    )
+
+    storage = Storage(":memory:")
+    extensions = ExtensionRegistry(workspace)
+    runtime = Runtime(cfg, storage, extensions)
+    return runtime, storage
+
+
+@pytest.fixture(scope="session")
+def make_runtime() -> Callable[[Path], tuple[Runtime, Storage]]:
+    """Factory for an uninitialized runtime rooted at the given workspace."""
+    return _make_runtime
@@ -3,28 +3,28 @@ from __future__ import annotations
 import os
 from pathlib import Path
 
+import pytest
+
 from pith.config import load_config
 
+_ENV_BODY = b"OPENAI_API_KEY=abc123\nOPENAI_BASE_URL=https://example.test/v1\n"
+_CONFIG_BODY = b"""version: 1
+model:
+  provider: openai
+  model: gpt-4o
+  api_key_env: OPENAI_API_KEY
+  base_url: ${OPENAI_BASE_URL}
+"""
+_CONFIG_MISSING_MODEL = b"version: 1\nmodel: {}\n"
+
 
 def test_load_config_with_env_substitution(tmp_path: Path, monkeypatch) -> None:
     workspace = tmp_path
     config_path = workspace / "config.yaml"
     env_path = workspace / ".env"
 
-    env_path.write_text(
-        "OPENAI_API_KEY=abc123\nOPENAI_BASE_URL=https://example.test/v1\n", encoding="utf-8"
-    )
-    config_path.write_text(
-        """
-version: 1
-model:
-  provider: openai
-  model: gpt-4o
-  api_key_env: OPENAI_API_KEY
-  base_url: ${OPENAI_BASE_URL}
-""".strip(),
-        encoding="utf-8",
-    )
+    env_path.write_bytes(_ENV_BODY)
+    config_path.write_bytes(_CONFIG_BODY)
 
     monkeypatch.delenv("OPENAI_API_KEY", raising=False)
     monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
@@ -42,15 +42,7 @@ model:
 
 def test_load_config_missing_model_fields(tmp_path: Path) -> None:
     config_path = tmp_path / "config.yaml"
-    config_path.write_text(
-        """
-version: 1
-model: {}
-""".strip(),
-        encoding="utf-8",
-    )
-
-    import pytest
+    config_path.write_bytes(_CONFIG_MISSING_MODEL)
 
     with pytest.raises(ValueError, match="model.provider is required"):
         load_config(config_path=config_path, workspace_root=tmp_path)
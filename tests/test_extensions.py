@@ -7,18 +7,24 @@ import pytest
 from pith.extensions import ExtensionError, ExtensionRegistry
 
 
-@pytest.mark.asyncio
-async def test_extension_tool_loaded(tmp_path: Path) -> None:
-    tools_dir = tmp_path / "extensions" / "tools"
-    tools_dir.mkdir(parents=True, exist_ok=True)
+@pytest.fixture(scope="session")
+def greet_workspace(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Read-only workspace with a single greet tool, written once per session."""
+    workspace = tmp_path_factory.mktemp("greet_ext")
+    tools_dir = workspace / "extensions" / "tools"
+    tools_dir.mkdir(parents=True)
     (tools_dir / "greet.py").write_text(
         "async def run(name: str = 'world') -> str:\n"
         '    """Say hello."""\n'
         "    return f'hello {name}'\n",
         encoding="utf-8",
     )
+    return workspace
 
-    registry = ExtensionRegistry(tmp_path)
+
+@pytest.mark.asyncio
+async def test_extension_tool_loaded(greet_workspace: Path) -> None:
+    registry = ExtensionRegistry(greet_workspace)
     await registry.refresh()
 
     assert "greet" in registry.tools
@@ -40,3 +46,22 @@ async def test_extension_channel_missing_attr(tmp_path: Path) -> None:
     registry = ExtensionRegistry(tmp_path)
     with pytest.raises(ExtensionError, match="missing send"):
         await registry.refresh()
+
+
+@pytest.mark.asyncio
+async def test_refresh_reuses_unchanged_modules(tmp_path: Path) -> None:
+    tools_dir = tmp_path / "extensions" / "tools"
+    tools_dir.mkdir(parents=True, exist_ok=True)
+    tool_file = tools_dir / "greet.py"
+    tool_file.write_text("def run() -> str:\n    return 'v1'\n", encoding="utf-8")
+
+    registry = ExtensionRegistry(tmp_path)
+    await registry.refresh()
+    first_fn = registry.tools["greet"].fn
+
+    await registry.refresh()
+    assert registry.tools["greet"].fn is first_fn
+
+    tool_file.write_text("def run() -> str:\n    return 'v2!'\n", encoding="utf-8")
+    await registry.refresh()
+    assert await registry.call_tool("greet") == "v2!"
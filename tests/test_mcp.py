@@ -1,33 +1,61 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
-from unittest.mock import AsyncMock, patch
 
 import httpx
 import pytest
 
 from pith.mcp import MCPRegistry, _parse_server_config
 
-_FAKE_REQUEST = httpx.Request("POST", "https://fake.test/rpc")
+_RealAsyncClient = httpx.AsyncClient
 
 
-def _make_response(status: int, json_data: dict) -> httpx.Response:
-    return httpx.Response(status, json=json_data, request=_FAKE_REQUEST)
+@pytest.fixture
+def mcp_responses(monkeypatch: pytest.MonkeyPatch) -> dict[tuple[str, str], dict | Exception]:
+    """Route MCP requests through one MockTransport keyed by (host, rpc method).
 
+    Tests fill the returned dict; an Exception value is raised instead of answered.
+    """
+    responses: dict[tuple[str, str], dict | Exception] = {}
 
-def _write_config(mcp_dir: Path, name: str, content: str) -> Path:
+    def handler(request: httpx.Request) -> httpx.Response:
+        method = json.loads(request.content)["method"]
+        result = responses[(request.url.host, method)]
+        if isinstance(result, Exception):
+            raise result
+        return httpx.Response(200, json=result)
+
+    transport = httpx.MockTransport(handler)
+
+    class _MockedAsyncClient(_RealAsyncClient):
+        def __init__(self, **kwargs) -> None:
+            super().__init__(transport=transport, **kwargs)
+
+    monkeypatch.setattr(httpx, "AsyncClient", _MockedAsyncClient)
+    return responses
+
+
+def _write_config(mcp_dir: Path, name: str, content: bytes) -> Path:
     mcp_dir.mkdir(parents=True, exist_ok=True)
     path = mcp_dir / f"{name}.yaml"
-    path.write_text(content, encoding="utf-8")
+    path.write_bytes(content)
     return path
 
 
 # -- Config parsing --
 
+_CFG_BASIC = b"url: https://mcp.example.com/rpc\n"
+_CFG_HEADERS = b"url: https://mcp.example.com/rpc\nheaders:\n  Authorization: Bearer tok123\n"
+_CFG_ENV_HEADER = (
+    b"url: https://mcp.example.com/rpc\nheaders:\n  Authorization: Bearer ${MCP_TOKEN}\n"
+)
+_CFG_NO_URL = b"headers:\n  X-Key: val\n"
+
 
 def test_parse_server_config_basic(tmp_path: Path) -> None:
     path = tmp_path / "test.yaml"
-    path.write_text("url: https://mcp.example.com/rpc\n", encoding="utf-8")
+    path.write_bytes(_CFG_BASIC)
     server = _parse_server_config("test", path)
     assert server.name == "test"
     assert server.url == "https://mcp.example.com/rpc"
@@ -36,10 +64,7 @@ def test_parse_server_config_basic(tmp_path: Path) -> None:
 
 def test_parse_server_config_with_headers(tmp_path: Path) -> None:
     path = tmp_path / "test.yaml"
-    path.write_text(
-        "url: https://mcp.example.com/rpc\nheaders:\n  Authorization: Bearer tok123\n",
-        encoding="utf-8",
-    )
+    path.write_bytes(_CFG_HEADERS)
     server = _parse_server_config("test", path)
     assert server.headers == {"Authorization": "Bearer tok123"}
 
@@ -49,17 +74,14 @@ def test_parse_server_config_env_var_substitution(
 ) -> None:
     monkeypatch.setenv("MCP_TOKEN", "secret_val")
     path = tmp_path / "test.yaml"
-    path.write_text(
-        "url: https://mcp.example.com/rpc\nheaders:\n  Authorization: Bearer ${MCP_TOKEN}\n",
-        encoding="utf-8",
-    )
+    path.write_bytes(_CFG_ENV_HEADER)
     server = _parse_server_config("test", path)
     assert server.headers == {"Authorization": "Bearer secret_val"}
 
 
 def test_parse_server_config_missing_url(tmp_path: Path) -> None:
     path = tmp_path / "test.yaml"
-    path.write_text("headers:\n  X-Key: val\n", encoding="utf-8")
+    path.write_bytes(_CFG_NO_URL)
     with pytest.raises(ValueError, match="missing 'url'"):
         _parse_server_config("test", path)
 
@@ -80,27 +102,17 @@ def _tool_call_response(text: str) -> dict:
 
 
 @pytest.mark.asyncio
-async def test_discover_tools(tmp_path: Path) -> None:
+async def test_discover_tools(tmp_path: Path, mcp_responses: dict) -> None:
     mcp_dir = tmp_path / "mcp"
-    _write_config(mcp_dir, "slack", "url: https://slack.mcp.test/rpc\n")
+    _write_config(mcp_dir, "slack", b"url: https://slack.mcp.test/rpc\n")
 
-    mock_response = _make_response(
-        200,
-        _tools_list_response([
-            {"name": "send_message", "description": "Send a Slack message", "inputSchema": {}},
-            {"name": "list_channels", "description": "List channels", "inputSchema": {}},
-        ]),
-    )
+    mcp_responses[("slack.mcp.test", "tools/list")] = _tools_list_response([
+        {"name": "send_message", "description": "Send a Slack message", "inputSchema": {}},
+        {"name": "list_channels", "description": "List channels", "inputSchema": {}},
+    ])
 
     registry = MCPRegistry()
-    with patch("pith.mcp.httpx.AsyncClient") as mock_client_cls:
-        mock_client = AsyncMock()
-        mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
-        mock_client_cls.return_value = mock_client
-
-        await registry.refresh(mcp_dir)
+    await registry.refresh(mcp_dir)
 
     assert "mcp_slack_send_message" in registry.tools
     assert "mcp_slack_list_channels" in registry.tools
@@ -109,30 +121,18 @@ async def test_discover_tools(tmp_path: Path) -> None:
 
 
 @pytest.mark.asyncio
-async def test_call_tool(tmp_path: Path) -> None:
+async def test_call_tool(tmp_path: Path, mcp_responses: dict) -> None:
     mcp_dir = tmp_path / "mcp"
-    _write_config(mcp_dir, "slack", "url: https://slack.mcp.test/rpc\n")
+    _write_config(mcp_dir, "slack", b"url: https://slack.mcp.test/rpc\n")
 
-    discovery_response = _make_response(
-        200,
-        _tools_list_response([
-            {"name": "send_message", "description": "Send", "inputSchema": {}},
-        ]),
-    )
-    call_response = _make_response(200, _tool_call_response("message sent"))
+    mcp_responses[("slack.mcp.test", "tools/list")] = _tools_list_response([
+        {"name": "send_message", "description": "Send", "inputSchema": {}},
+    ])
+    mcp_responses[("slack.mcp.test", "tools/call")] = _tool_call_response("message sent")
 
     registry = MCPRegistry()
-    with patch("pith.mcp.httpx.AsyncClient") as mock_client_cls:
-        mock_client = AsyncMock()
-        mock_client.post = AsyncMock(side_effect=[discovery_response, call_response])
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
-        mock_client_cls.return_value = mock_client
-
-        await registry.refresh(mcp_dir)
-        result = await registry.call(
-            "mcp_slack_send_message", {"channel": "#general", "text": "hi"}
-        )
+    await registry.refresh(mcp_dir)
+    result = await registry.call("mcp_slack_send_message", {"channel": "#general", "text": "hi"})
 
     assert result == "message sent"
 
@@ -145,37 +145,18 @@ async def test_call_unknown_tool() -> None:
 
 
 @pytest.mark.asyncio
-async def test_unreachable_server_skipped(tmp_path: Path) -> None:
+async def test_unreachable_server_skipped(tmp_path: Path, mcp_responses: dict) -> None:
     mcp_dir = tmp_path / "mcp"
-    _write_config(mcp_dir, "broken", "url: https://broken.mcp.test/rpc\n")
-    _write_config(mcp_dir, "working", "url: https://working.mcp.test/rpc\n")
+    _write_config(mcp_dir, "broken", b"url: https://broken.mcp.test/rpc\n")
+    _write_config(mcp_dir, "working", b"url: https://working.mcp.test/rpc\n")
 
-    working_response = _make_response(
-        200,
-        _tools_list_response([
-            {"name": "ping", "description": "Ping", "inputSchema": {}},
-        ]),
-    )
+    mcp_responses[("broken.mcp.test", "tools/list")] = httpx.ConnectError("connection refused")
+    mcp_responses[("working.mcp.test", "tools/list")] = _tools_list_response([
+        {"name": "ping", "description": "Ping", "inputSchema": {}},
+    ])
 
     registry = MCPRegistry()
-    with patch("pith.mcp.httpx.AsyncClient") as mock_client_cls:
-        mock_client = AsyncMock()
-
-        async def _route_post(url: str, **kwargs) -> httpx.Response:
-            # Use the url from the payload context — we detect by checking
-            # which server is being called based on call order
-            call_count = mock_client.post.call_count
-            if call_count == 1:
-                # First call is to "broken" (alphabetically first)
-                raise httpx.ConnectError("connection refused")
-            return working_response
-
-        mock_client.post = AsyncMock(side_effect=_route_post)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
-        mock_client_cls.return_value = mock_client
-
-        await registry.refresh(mcp_dir)
+    await registry.refresh(mcp_dir)
 
     # broken server skipped, working server discovered
     assert "mcp_broken_ping" not in registry.tools
@@ -200,26 +181,16 @@ async def test_nonexistent_mcp_dir(tmp_path: Path) -> None:
 
 
 @pytest.mark.asyncio
-async def test_get_tool_descriptions(tmp_path: Path) -> None:
+async def test_get_tool_descriptions(tmp_path: Path, mcp_responses: dict) -> None:
     mcp_dir = tmp_path / "mcp"
-    _write_config(mcp_dir, "svc", "url: https://svc.test/rpc\n")
+    _write_config(mcp_dir, "svc", b"url: https://svc.test/rpc\n")
 
-    mock_response = _make_response(
-        200,
-        _tools_list_response([
-            {"name": "do_thing", "description": "Does a thing", "inputSchema": {}},
-        ]),
-    )
+    mcp_responses[("svc.test", "tools/list")] = _tools_list_response([
+        {"name": "do_thing", "description": "Does a thing", "inputSchema": {}},
+    ])
 
     registry = MCPRegistry()
-    with patch("pith.mcp.httpx.AsyncClient") as mock_client_cls:
-        mock_client = AsyncMock()
-        mock_client.post = AsyncMock(return_value=mock_response)
-        mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-        mock_client.__aexit__ = AsyncMock(return_value=None)
-        mock_client_cls.return_value = mock_client
-
-        await registry.refresh(mcp_dir)
+    await registry.refresh(mcp_dir)
 
     descs = registry.get_tool_descriptions()
     assert descs == {"mcp_svc_do_thing": "Does a thing"}
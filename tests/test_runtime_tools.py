@@ -1,39 +1,32 @@
 from __future__ import annotations
 
+import asyncio
+import re
+from collections.abc import AsyncIterator
 from pathlib import Path
 
 import pytest
-from pydantic_ai.models.test import TestModel
+import pytest_asyncio
+from pydantic_ai import Agent
 
-from pith.config import Config, ModelConfig, RuntimeConfig
-from pith.extensions import ExtensionRegistry
 from pith.runtime import Runtime
 from pith.storage import Storage
 
+_FOO_RE = re.compile("foo")
 
-def _make_runtime(tmp_path: Path) -> tuple[Runtime, Storage]:
-    workspace = tmp_path
-    db_path = workspace / "memory.db"
 
-    cfg = Config(
-        version=1,
-        runtime=RuntimeConfig(
-            workspace_path=str(workspace),
-            memory_db_path=str(db_path),
-            log_dir=str(workspace / "logs"),
-        ),
-        model=ModelConfig(provider="test", model="test-model", api_key_env="TEST_KEY"),
-    )
-
-    storage = Storage(db_path)
-    extensions = ExtensionRegistry(workspace)
-    runtime = Runtime(cfg, storage, extensions)
-    return runtime, storage
+@pytest_asyncio.fixture(scope="module")
+async def shared_runtime(tmp_path_factory, make_runtime) -> AsyncIterator[tuple[Runtime, Storage]]:
+    """One initialized runtime per module; schema setup and extension refresh run once."""
+    runtime, storage = make_runtime(tmp_path_factory.mktemp("runtime"))
+    async with storage:
+        await runtime.initialize()
+        yield runtime, storage
 
 
 @pytest.mark.asyncio
-async def test_path_sandboxing(tmp_path: Path) -> None:
-    runtime, storage = _make_runtime(tmp_path)
+async def test_path_sandboxing(tmp_path: Path, make_runtime) -> None:
+    runtime, storage = make_runtime(tmp_path)
 
     # Valid workspace-relative path
     resolved = runtime._resolve_workspace_path("foo/bar.txt")
@@ -44,51 +37,51 @@ async def test_path_sandboxing(tmp_path: Path) -> None:
         runtime._resolve_workspace_path("../../etc/passwd")
 
 
-@pytest.mark.asyncio
-async def test_tool_registration_on_agent(tmp_path: Path) -> None:
-    runtime, storage = _make_runtime(tmp_path)
-    async with storage:
-        await runtime.initialize()
+@pytest.fixture(scope="module")
+def built_agents(shared_runtime) -> dict[str, Agent[None, str]]:
+    """Build each agent variant once; tool registration is the expensive part."""
+    # Imported here so collecting the other tests skips pydantic_ai.models.test.
+    from pydantic_ai.models.test import TestModel
 
-        agent = runtime._build_agent(bootstrap=False, model=TestModel())
-
-        # Check that individual tools are registered with proper names
-        tool_names = {t.name for t in agent._function_toolset.tools.values()}
-        expected = {
-            "read",
-            "write",
-            "edit",
-            "list_dir",
-            "file_search",
-            "run_python",
-            "memory_save",
-            "memory_search",
-            "set_profile",
-            "tool_call",
-            "list_secrets",
-            "store_secret",
-        }
-        assert expected.issubset(tool_names), f"Missing tools: {expected - tool_names}"
+    runtime, _ = shared_runtime
+    return {
+        "default": runtime._build_agent(bootstrap=False, model=TestModel()),
+        "bootstrap": runtime._build_agent(bootstrap=True, model=TestModel()),
+    }
 
 
-@pytest.mark.asyncio
-async def test_bootstrap_has_set_profile_tool(tmp_path: Path) -> None:
-    runtime, storage = _make_runtime(tmp_path)
-    async with storage:
-        await runtime.initialize()
+def test_tool_registration_on_agent(built_agents: dict[str, Agent[None, str]]) -> None:
+    agent = built_agents["default"]
 
-        agent = runtime._build_agent(bootstrap=True, model=TestModel())
-        tool_names = {t.name for t in agent._function_toolset.tools.values()}
-        assert "set_profile" in tool_names
+    # Check that individual tools are registered with proper names
+    tool_names = {t.name for t in agent._function_toolset.tools.values()}
+    expected = {
+        "read",
+        "write",
+        "edit",
+        "list_dir",
+        "file_search",
+        "run_python",
+        "memory_save",
+        "memory_search",
+        "set_profile",
+        "tool_call",
+        "list_secrets",
+        "store_secret",
+    }
+    assert expected.issubset(tool_names), f"Missing tools: {expected - tool_names}"
+
+
+def test_bootstrap_has_set_profile_tool(built_agents: dict[str, Agent[None, str]]) -> None:
+    agent = built_agents["bootstrap"]
+    tool_names = {t.name for t in agent._function_toolset.tools.values()}
+    assert "set_profile" in tool_names
 
 
 @pytest.mark.asyncio
-async def test_memory_tools_via_storage(tmp_path: Path) -> None:
+async def test_memory_tools_via_storage() -> None:
     """Test memory save/search through storage directly (since tools are agent-registered)."""
-    runtime, storage = _make_runtime(tmp_path)
-    async with storage:
-        await runtime.initialize()
-
+    async with Storage(":memory:") as storage:
         memory_id = await storage.memory_save("alpha memory", kind="durable", tags=["test"])
         assert memory_id > 0
 
@@ -98,49 +91,43 @@ async def test_memory_tools_via_storage(tmp_path: Path) -> None:
 
 
 @pytest.mark.asyncio
-async def test_list_dir(tmp_path: Path) -> None:
-    runtime, _ = _make_runtime(tmp_path)
+async def test_list_dir(tmp_path: Path, make_runtime) -> None:
+    from pydantic_ai.models.test import TestModel
+
+    runtime, _ = make_runtime(tmp_path)
     (tmp_path / "a.txt").write_text("hello")
     (tmp_path / "sub").mkdir()
     (tmp_path / "sub" / "b.py").write_text("x = 1")
+    (tmp_path / "sub" / "c.txt").write_text("")
 
-    # Basic listing
-    result = runtime._resolve_workspace_path(".")
-    assert result.is_dir()
-
-    # Glob filter — call the underlying logic directly
-    import fnmatch
+    agent = runtime._build_agent(bootstrap=False, model=TestModel())
+    list_dir = agent._function_toolset.tools["list_dir"].function
 
-    entries = sorted(tmp_path.iterdir())
-    names = [e.name for e in entries]
-    assert "a.txt" in names
-    assert "sub" in names
-
-    py_names = [n for n in names if fnmatch.fnmatch(n, "*.txt")]
-    assert py_names == ["a.txt"]
+    assert (await list_dir()).splitlines() == ["a.txt", "sub/"]
+    assert await list_dir(glob="*.txt") == "a.txt"
+    assert (await list_dir(glob="*.txt", recursive=True)).splitlines() == [
+        "a.txt",
+        "sub/c.txt",
+    ]
+    assert await list_dir("sub", glob="*.md") == "(empty)"
 
 
 @pytest.mark.asyncio
-async def test_search(tmp_path: Path) -> None:
-    runtime, _ = _make_runtime(tmp_path)
+async def test_search(tmp_path: Path, make_runtime) -> None:
+    runtime, _ = make_runtime(tmp_path)
     (tmp_path / "hello.txt").write_text("foo bar baz\nqux quux")
     (tmp_path / "other.py").write_text("def foo():\n    return 42\n")
 
     # Search for "foo" across workspace
-    import re
-
     ws = tmp_path.resolve()
-    pattern = re.compile("foo")
     matches = []
-    for fp in sorted(ws.rglob("*")):
-        if not fp.is_file():
-            continue
+    for fp in (ws / "hello.txt", ws / "other.py"):
         try:
             text = fp.read_text(encoding="utf-8")
         except (UnicodeDecodeError, PermissionError):
             continue
         for lineno, line in enumerate(text.splitlines(), 1):
-            if pattern.search(line):
+            if _FOO_RE.search(line):
                 matches.append(f"{fp.relative_to(ws)}:{lineno}: {line}")
     assert len(matches) == 2
     assert any("hello.txt:1:" in m for m in matches)
@@ -148,8 +135,26 @@ async def test_search(tmp_path: Path) -> None:
 
 
 @pytest.mark.asyncio
-async def test_read_soul_file(tmp_path: Path) -> None:
-    runtime, storage = _make_runtime(tmp_path)
+async def test_file_search_tool(tmp_path: Path, make_runtime) -> None:
+    from pydantic_ai.models.test import TestModel
+
+    runtime, _ = make_runtime(tmp_path)
+    (tmp_path / "hello.txt").write_text("foo bar baz\nqux quux")
+    (tmp_path / "other.py").write_text("def foo():\n    return 42\n")
+    (tmp_path / "blob.bin").write_bytes(b"\xff\xfe foo")
+
+    agent = runtime._build_agent(bootstrap=False, model=TestModel())
+    file_search = agent._function_toolset.tools["file_search"].function
+
+    literal = await file_search("foo", literal=True)
+    assert literal.splitlines() == ["hello.txt:1: foo bar baz", "other.py:1: def foo():"]
+    assert await file_search("^qux") == "hello.txt:2: qux quux"
+    assert await file_search("nothing", literal=True) == "no matches"
+
+
+@pytest.mark.asyncio
+async def test_read_soul_file(tmp_path: Path, make_runtime) -> None:
+    runtime, storage = make_runtime(tmp_path)
     (tmp_path / "SOUL.md").write_text("I am pith.", encoding="utf-8")
 
     soul = runtime._read_soul()
@@ -157,7 +162,33 @@ async def test_read_soul_file(tmp_path: Path) -> None:
 
 
 @pytest.mark.asyncio
-async def test_read_soul_file_missing(tmp_path: Path) -> None:
-    runtime, storage = _make_runtime(tmp_path)
+async def test_read_soul_file_missing(tmp_path: Path, make_runtime) -> None:
+    runtime, storage = make_runtime(tmp_path)
     soul = runtime._read_soul()
     assert soul == ""
+
+
+@pytest.mark.asyncio
+async def test_initialize_cancels_storage_setup_on_refresh_error(
+    tmp_path: Path, make_runtime, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    runtime, _ = make_runtime(tmp_path)
+    storage_cancelled = asyncio.Event()
+
+    async def failing_refresh() -> None:
+        await asyncio.sleep(0)
+        raise ValueError("bad channel")
+
+    async def slow_storage_setup() -> None:
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            storage_cancelled.set()
+            raise
+
+    monkeypatch.setattr(runtime.extensions, "refresh", failing_refresh)
+    monkeypatch.setattr(runtime, "_initialize_storage", slow_storage_setup)
+
+    with pytest.raises(ValueError, match="bad channel"):
+        await runtime.initialize()
+    assert storage_cancelled.is_set()
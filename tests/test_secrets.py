@@ -4,153 +4,117 @@ from __future__ import annotations
 
 import asyncio
 import os
+from collections.abc import Awaitable, Callable
 from pathlib import Path
 
 import pytest
 
-from pith.config import Config, ModelConfig, RuntimeConfig
-from pith.extensions import ExtensionRegistry
-from pith.runtime import Runtime
-from pith.storage import Storage
-
-
-def _make_runtime(tmp_path: Path) -> tuple[Runtime, Storage]:
-    workspace = tmp_path / "workspace"
-    workspace.mkdir()
-    db_path = tmp_path / "memory.db"
-
-    cfg = Config(
-        version=1,
-        runtime=RuntimeConfig(
-            workspace_path=str(workspace),
-            memory_db_path=str(db_path),
-            log_dir=str(workspace / "logs"),
-        ),
-        model=ModelConfig(provider="test", model="test-model", api_key_env="TEST_KEY"),
-    )
-
-    storage = Storage(db_path)
-    extensions = ExtensionRegistry(workspace)
-    runtime = Runtime(cfg, storage, extensions)
-    return runtime, storage
+from pith.config import _load_workspace_env
+from pith.runtime import Runtime, _upsert_env_var
 
 
 @pytest.mark.asyncio
-async def test_list_secrets_empty(tmp_path: Path) -> None:
+async def test_list_secrets_empty(tmp_path: Path, make_runtime) -> None:
     """list_secrets returns empty list when no .env exists."""
-    runtime, storage = _make_runtime(tmp_path)
+    runtime, storage = make_runtime(tmp_path / "workspace")
     async with storage:
         await runtime.initialize()
 
     # env_path is workspace parent (tmp_path) / ".env"
-    import json
-
     env_path = runtime.env_path
     assert not env_path.exists()
-
-    # Simulate what the tool does
-    result = "[]"
-    assert json.loads(result) == []
+    assert runtime._env_keys() == []
 
 
 @pytest.mark.asyncio
-async def test_list_secrets_returns_names(tmp_path: Path) -> None:
+async def test_list_secrets_returns_names(tmp_path: Path, make_runtime) -> None:
     """list_secrets returns key names from .env."""
-    runtime, storage = _make_runtime(tmp_path)
+    runtime, storage = make_runtime(tmp_path / "workspace")
     async with storage:
         await runtime.initialize()
 
-    import json
-
     env_path = runtime.env_path
     env_path.write_text("BRAVE_API_KEY=secret123\n# comment\nOTHER_KEY=val\n", encoding="utf-8")
 
-    # Read key names the same way list_secrets tool does
-    names: list[str] = []
-    for line in env_path.read_text(encoding="utf-8").splitlines():
-        line = line.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        key = line.split("=", 1)[0].strip()
-        if key:
-            names.append(key)
-
+    names = runtime._env_keys()
     assert names == ["BRAVE_API_KEY", "OTHER_KEY"]
-    assert json.loads(json.dumps(names)) == ["BRAVE_API_KEY", "OTHER_KEY"]
+
+    # Unchanged file is served from the cache; a rewrite is picked up.
+    assert runtime._env_keys() is names
+    _upsert_env_var(env_path, "NEW_KEY", "x")
+    assert runtime._env_keys() == ["BRAVE_API_KEY", "OTHER_KEY", "NEW_KEY"]
+
+
+def _store_secret_tool(runtime: Runtime) -> Callable[[str], Awaitable[str]]:
+    # Imported here so collecting the other tests skips pydantic_ai.models.test.
+    from pydantic_ai.models.test import TestModel
+
+    agent = runtime._build_agent(bootstrap=False, model=TestModel())
+    return agent._function_toolset.tools["store_secret"].function
 
 
 @pytest.mark.asyncio
-async def test_store_secret_with_callback(tmp_path: Path) -> None:
+async def test_store_secret_with_callback(
+    tmp_path: Path, make_runtime, monkeypatch: pytest.MonkeyPatch
+) -> None:
     """store_secret writes to .env and os.environ when callback provides a value."""
-    runtime, storage = _make_runtime(tmp_path)
-    async with storage:
-        await runtime.initialize()
-
-    env_path = runtime.env_path
+    runtime, _ = make_runtime(tmp_path / "workspace")
+    store_secret = _store_secret_tool(runtime)
     secret_name = "TEST_SECRET_KEY"
+    monkeypatch.delenv(secret_name, raising=False)
 
-    # Clean up env if it exists from prior test
-    os.environ.pop(secret_name, None)
-
-    async def mock_on_secret_request(request_id: str, name: str) -> None:
+    async def on_secret_request(request_id: str, name: str) -> None:
         """Simulate the client providing the secret value."""
-        # Small delay to simulate round-trip
-        await asyncio.sleep(0.01)
+        assert name == secret_name
+        # Yield one loop tick so the value arrives across a suspension
+        await asyncio.sleep(0)
         runtime.provide_secret(request_id, "my-secret-value")
 
-    runtime._on_secret_request = mock_on_secret_request
+    runtime._on_secret_request = on_secret_request
 
-    # Simulate what store_secret does
-    import uuid
-
-    request_id = uuid.uuid4().hex[:12]
-    event = asyncio.Event()
-    runtime._pending_secrets[request_id] = event
-
-    await runtime._on_secret_request(request_id, secret_name)
-    await asyncio.wait_for(event.wait(), timeout=5)
+    assert await store_secret(secret_name) == f"stored secret '{secret_name}'"
+    assert runtime.env_path.read_bytes() == f"{secret_name}=my-secret-value\n".encode()
+    assert os.environ[secret_name] == "my-secret-value"
+    assert runtime._pending_secrets == {}
 
-    value = runtime._secret_values.pop(request_id, "")
-    assert value == "my-secret-value"
 
-    # Write to .env
-    lines: list[str] = []
-    lines.append(f"{secret_name}={value}")
-    env_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+@pytest.mark.asyncio
+async def test_store_secret_empty_value(tmp_path: Path, make_runtime) -> None:
+    """store_secret stores nothing when the client answers with an empty value."""
+    runtime, _ = make_runtime(tmp_path / "workspace")
+    store_secret = _store_secret_tool(runtime)
 
-    os.environ[secret_name] = value
+    async def on_secret_request(request_id: str, name: str) -> None:
+        runtime.provide_secret(request_id, "")
 
-    assert env_path.read_text(encoding="utf-8").strip() == f"{secret_name}=my-secret-value"
-    assert os.environ[secret_name] == "my-secret-value"
+    runtime._on_secret_request = on_secret_request
 
-    # Clean up
-    os.environ.pop(secret_name, None)
-    runtime._pending_secrets.pop(request_id, None)
+    assert await store_secret("EMPTY_KEY") == "error: no value provided"
+    assert not runtime.env_path.exists()
+    assert runtime._pending_secrets == {}
 
 
-@pytest.mark.asyncio
-async def test_store_secret_timeout(tmp_path: Path) -> None:
+def test_store_secret_timeout(
+    tmp_path: Path, make_runtime, monkeypatch: pytest.MonkeyPatch
+) -> None:
     """store_secret returns error on timeout when no value is provided."""
-    runtime, storage = _make_runtime(tmp_path)
-    async with storage:
-        await runtime.initialize()
+    runtime, _ = make_runtime(tmp_path / "workspace")
+    store_secret = _store_secret_tool(runtime)
+    monkeypatch.setattr("pith.runtime.SECRET_TIMEOUT", 0)
 
-    request_id = "test-timeout"
-    event = asyncio.Event()
-    runtime._pending_secrets[request_id] = event
+    async def never_answers(request_id: str, name: str) -> None:
+        pass
 
-    with pytest.raises(asyncio.TimeoutError):
-        await asyncio.wait_for(event.wait(), timeout=0.05)
+    runtime._on_secret_request = never_answers
 
-    runtime._pending_secrets.pop(request_id, None)
+    assert asyncio.run(store_secret("SLOW_KEY")) == "error: timed out waiting for secret input"
+    assert runtime._pending_secrets == {}
+    assert not runtime.env_path.exists()
 
 
-@pytest.mark.asyncio
-async def test_store_secret_no_callback(tmp_path: Path) -> None:
+def test_store_secret_no_callback(tmp_path: Path, make_runtime) -> None:
     """store_secret returns error when no callback (non-interactive)."""
-    runtime, storage = _make_runtime(tmp_path)
-    async with storage:
-        await runtime.initialize()
+    runtime, _ = make_runtime(tmp_path / "workspace")
 
     # _on_secret_request defaults to not being set, so set it to None
     runtime._on_secret_request = None
@@ -158,58 +122,98 @@ async def test_store_secret_no_callback(tmp_path: Path) -> None:
 
 
 @pytest.mark.asyncio
-async def test_provide_secret_flow(tmp_path: Path) -> None:
-    """Full provide_secret round-trip: event is set, value is retrievable."""
-    runtime, _ = _make_runtime(tmp_path)
+async def test_provide_secret_flow(tmp_path: Path, make_runtime) -> None:
+    """Full provide_secret round-trip: the pending future resolves with the value."""
+    runtime, _ = make_runtime(tmp_path / "workspace")
 
     request_id = "abc123"
-    event = asyncio.Event()
-    runtime._pending_secrets[request_id] = event
+    pending = asyncio.get_running_loop().create_future()
+    runtime._pending_secrets[request_id] = pending
 
-    assert not event.is_set()
+    assert not pending.done()
     runtime.provide_secret(request_id, "the-value")
-    assert event.is_set()
-    assert runtime._secret_values[request_id] == "the-value"
+    assert pending.result() == "the-value"
+    assert request_id not in runtime._pending_secrets
+
+    # Unknown or repeated request ids are ignored
+    runtime.provide_secret(request_id, "again")
 
 
 @pytest.mark.asyncio
-async def test_env_path_is_outside_workspace(tmp_path: Path) -> None:
+async def test_env_path_is_outside_workspace(tmp_path: Path, make_runtime) -> None:
     """env_path should be in config_dir (workspace parent), not workspace itself."""
-    runtime, _ = _make_runtime(tmp_path)
+    runtime, _ = make_runtime(tmp_path / "workspace")
     workspace = Path(runtime.cfg.runtime.workspace_path)
     assert runtime.env_path == workspace.parent / ".env"
     assert not str(runtime.env_path).startswith(str(workspace))
 
 
 @pytest.mark.asyncio
-async def test_store_secret_replaces_existing(tmp_path: Path) -> None:
+async def test_store_secret_replaces_existing(tmp_path: Path, make_runtime) -> None:
     """store_secret replaces an existing key in .env rather than duplicating it."""
-    runtime, storage = _make_runtime(tmp_path)
+    runtime, storage = make_runtime(tmp_path / "workspace")
     async with storage:
         await runtime.initialize()
 
     env_path = runtime.env_path
     env_path.write_text("FOO=old\nBAR=keep\n", encoding="utf-8")
 
-    # Simulate the replacement logic from store_secret
-    name = "FOO"
-    value = "new"
-    lines: list[str] = []
-    replaced = False
-    for line in env_path.read_text(encoding="utf-8").splitlines():
-        stripped = line.strip()
-        if stripped and not stripped.startswith("#") and "=" in stripped:
-            key = stripped.split("=", 1)[0].strip()
-            if key == name:
-                lines.append(f"{name}={value}")
-                replaced = True
-                continue
-        lines.append(line)
-    if not replaced:
-        lines.append(f"{name}={value}")
-    env_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
-
-    content = env_path.read_text(encoding="utf-8")
-    assert content.count("FOO=") == 1
-    assert "FOO=new" in content
-    assert "BAR=keep" in content
+    _upsert_env_var(env_path, "FOO", "new")
+    _upsert_env_var(env_path, "BAZ", "added")
+
+    assert env_path.read_bytes() == b"FOO=new\nBAR=keep\nBAZ=added\n"
+    assert [p.name for p in env_path.parent.iterdir() if p.name.startswith(".env.")] == []
+
+
+def test_upsert_env_var_writes_through_symlink(tmp_path: Path) -> None:
+    """A symlinked .env is updated at its target and keeps its mode."""
+    real = tmp_path / "real" / ".env"
+    real.parent.mkdir()
+    real.write_bytes(b"FOO=old\n")
+    real.chmod(0o644)
+    link = tmp_path / ".env"
+    link.symlink_to(real)
+
+    _upsert_env_var(link, "FOO", "new")
+
+    assert link.is_symlink()
+    assert real.read_bytes() == b"FOO=new\n"
+    assert real.stat().st_mode & 0o777 == 0o644
+
+
+def test_env_keys_match_loader_and_upsert(
+    tmp_path: Path, make_runtime, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """list_secrets, .env loading and store_secret agree on what a key is."""
+    runtime, _ = make_runtime(tmp_path / "workspace")
+    env_path = runtime.env_path
+    env_path.write_bytes(b"export FOO=1\nmy-key = a\n# NOTE=x\n")
+    monkeypatch.delenv("FOO", raising=False)
+    monkeypatch.delenv("my-key", raising=False)
+
+    assert runtime._env_keys() == ["FOO", "my-key"]
+
+    _load_workspace_env(env_path)
+    assert os.environ["FOO"] == "1"
+    assert os.environ["my-key"] == "a"
+
+    _upsert_env_var(env_path, "FOO", "2")
+    _upsert_env_var(env_path, "my-key", "b")
+    assert env_path.read_bytes() == b"FOO=2\nmy-key=b\n# NOTE=x\n"
+    assert runtime._env_keys() == ["FOO", "my-key"]
+
+
+def test_upsert_env_var_keeps_owner(tmp_path: Path) -> None:
+    """Rewriting .env keeps its uid/gid (e.g. root in Docker editing a host file)."""
+    env_path = tmp_path / ".env"
+    env_path.write_bytes(b"FOO=old\n")
+    try:
+        os.chown(env_path, 1234, 1234)
+    except PermissionError:
+        pytest.skip("changing file ownership requires root")
+
+    _upsert_env_var(env_path, "FOO", "new")
+
+    st = env_path.stat()
+    assert (st.st_uid, st.st_gid) == (1234, 1234)
+    assert env_path.read_bytes() == b"FOO=new\n"
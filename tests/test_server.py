@@ -2,49 +2,34 @@
 
 from __future__ import annotations
 
-from pathlib import Path
-
 import httpx
 import pytest
 import pytest_asyncio
 
-from pith.config import Config, ModelConfig, RuntimeConfig, ServerConfig
-from pith.extensions import ExtensionRegistry
-from pith.runtime import Runtime
 from pith.server import create_app
-from pith.storage import Storage
-
-
-def _make_runtime(tmp_path: Path) -> tuple[Runtime, Storage]:
-    workspace = tmp_path
-    db_path = workspace / "memory.db"
-
-    cfg = Config(
-        version=1,
-        runtime=RuntimeConfig(
-            workspace_path=str(workspace),
-            memory_db_path=str(db_path),
-            log_dir=str(workspace / "logs"),
-        ),
-        model=ModelConfig(provider="test", model="test-model", api_key_env="TEST_KEY"),
-        server=ServerConfig(),
-    )
-
-    storage = Storage(db_path)
-    extensions = ExtensionRegistry(workspace)
-    runtime = Runtime(cfg, storage, extensions)
-    return runtime, storage
 
 
-@pytest_asyncio.fixture
-async def client(tmp_path: Path):
-    runtime, storage = _make_runtime(tmp_path)
+@pytest_asyncio.fixture(scope="module")
+async def served_runtime(tmp_path_factory, make_runtime):
+    """One initialized runtime + ASGI transport per module; schema creation runs once."""
+    runtime, storage = make_runtime(tmp_path_factory.mktemp("server"))
     async with storage:
         await runtime.initialize()
         app = create_app(runtime)
-        transport = httpx.ASGITransport(app=app)
-        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
-            yield c
+        yield storage, httpx.ASGITransport(app=app)
+
+
+@pytest_asyncio.fixture
+async def client(served_runtime):
+    storage, transport = served_runtime
+    conn = await storage.connect()
+    for table in ("messages", "session_summaries", "sessions"):
+        await conn.execute(f"DELETE FROM {table}")
+    await conn.execute("DELETE FROM app_state WHERE key = 'active_session_id'")
+    await conn.commit()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
 
 
 @pytest.mark.asyncio
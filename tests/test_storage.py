@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 
 import pytest
@@ -14,10 +15,8 @@ from pith.storage import Storage
 
 
 @pytest.mark.asyncio
-async def test_storage_bootstrap_sessions_and_memory(tmp_path: Path) -> None:
-    db_path = tmp_path / "memory.db"
-
-    async with Storage(db_path) as storage:
+async def test_storage_bootstrap_sessions_and_memory() -> None:
+    async with Storage(":memory:") as storage:
         assert await storage.get_bootstrap_state() is False
 
         await storage.set_profile("agent", "name", "pith")
@@ -50,32 +49,31 @@ async def test_storage_bootstrap_sessions_and_memory(tmp_path: Path) -> None:
 
 @pytest.mark.asyncio
 async def test_storage_log_event_jsonl(tmp_path: Path) -> None:
-    db_path = tmp_path / "memory.db"
     log_path = tmp_path / "events.jsonl"
 
-    async with Storage(db_path, log_path=log_path) as storage:
+    async with Storage(":memory:", log_path=log_path) as storage:
         await storage.log_event("test.event", payload={"key": "value"})
+        # Events are visible to readers (e.g. `pith logs tail`) before close
+        assert log_path.read_bytes().count(b"\n") == 1
+        await storage.log_event("test.second", level="error")
 
-    assert log_path.exists()
     import json
 
-    line = log_path.read_text().strip()
-    entry = json.loads(line)
+    lines = log_path.read_text().splitlines()
+    entry = json.loads(lines[0])
     assert entry["event"] == "test.event"
     assert entry["payload"]["key"] == "value"
+    assert json.loads(lines[1])["level"] == "error"
 
 
 @pytest.mark.asyncio
-async def test_storage_compact_session(tmp_path: Path) -> None:
-    db_path = tmp_path / "memory.db"
-
-    async with Storage(db_path) as storage:
+async def test_storage_compact_session() -> None:
+    async with Storage(":memory:") as storage:
         session_id = await storage.ensure_active_session()
 
         # Add enough messages to trigger compaction
-        for i in range(10):
-            msg = ModelRequest(parts=[UserPromptPart(content=f"message {i}")])
-            await storage.append_messages(session_id, [msg])
+        msgs = [ModelRequest(parts=[UserPromptPart(content=f"message {i}")]) for i in range(10)]
+        await storage.append_messages(session_id, msgs)
 
         await storage.compact_session(session_id, keep_recent=3)
 
@@ -87,10 +85,8 @@ async def test_storage_compact_session(tmp_path: Path) -> None:
 
 
 @pytest.mark.asyncio
-async def test_memory_by_tag(tmp_path: Path) -> None:
-    db_path = tmp_path / "memory.db"
-
-    async with Storage(db_path) as storage:
+async def test_memory_by_tag() -> None:
+    async with Storage(":memory:") as storage:
         await storage.memory_save("review todo on startup", tags=["workflow", "startup"])
         await storage.memory_save("prefers dark mode", tags=["preferences"])
         await storage.memory_save("always greet warmly", tags=["workflow"])
@@ -107,3 +103,90 @@ async def test_memory_by_tag(tmp_path: Path) -> None:
 
         empty = await storage.memory_by_tag("nonexistent")
         assert len(empty) == 0
+
+
+@pytest.mark.asyncio
+async def test_transaction_commits_once_and_rolls_back(tmp_path: Path) -> None:
+    db_path = tmp_path / "memory.db"
+
+    async with Storage(db_path) as storage:
+        async with storage.transaction():
+            await storage.set_profile("agent", "name", "pith")
+            await storage.set_profile("agent", "nature", "assistant")
+        assert await storage.get_profile("agent") == {"name": "pith", "nature": "assistant"}
+
+        with pytest.raises(RuntimeError):
+            async with storage.transaction():
+                await storage.set_profile("user", "name", "david")
+                raise RuntimeError("boom")
+        assert await storage.get_profile("user") == {}
+
+
+@pytest.mark.asyncio
+async def test_transaction_isolated_from_other_tasks() -> None:
+    async with Storage(":memory:") as storage:
+        in_block = asyncio.Event()
+        other_started = asyncio.Event()
+
+        async def failing_block() -> None:
+            async with storage.transaction():
+                await storage.set_profile("user", "name", "david")
+                in_block.set()
+                await other_started.wait()
+                # Let the other task reach its writes before this block fails
+                for _ in range(5):
+                    await asyncio.sleep(0)
+                raise RuntimeError("boom")
+
+        async def other_task() -> str:
+            await in_block.wait()
+            other_started.set()
+            async with storage.transaction():
+                await storage.set_profile("agent", "name", "pith")
+            return await storage.new_session()
+
+        results = await asyncio.gather(failing_block(), other_task(), return_exceptions=True)
+        assert isinstance(results[0], RuntimeError)
+        session_id = results[1]
+
+        # Only the failing block's own write is rolled back
+        assert await storage.get_profile("user") == {}
+        assert await storage.get_profile("agent") == {"name": "pith"}
+        assert await storage.get_app_state("active_session_id") == session_id
+
+
+@pytest.mark.asyncio
+async def test_in_memory_storage(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+
+    async with Storage(":memory:") as storage:
+        session_id = await storage.new_session()
+        await storage.append_messages(
+            session_id, [ModelRequest(parts=[UserPromptPart(content="hello")])]
+        )
+        assert len(await storage.get_message_history(session_id)) == 1
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_append_messages_touches_session() -> None:
+    async with Storage(":memory:") as storage:
+        session_id = await storage.new_session()
+        conn = await storage.connect()
+        await conn.execute(
+            "UPDATE sessions SET updated_at='2000-01-01T00:00:00.000Z' WHERE id=?",
+            (session_id,),
+        )
+
+        await storage.append_messages(
+            session_id,
+            [
+                ModelRequest(parts=[UserPromptPart(content="hello")]),
+                ModelResponse(parts=[TextPart(content="hi")]),
+            ],
+        )
+
+        async with conn.execute("SELECT updated_at FROM sessions WHERE id=?", (session_id,)) as cur:
+            row = await cur.fetchone()
+        assert row[0] > "2000-01-01T00:00:00.000Z"